@@ -1,7 +1,15 @@
+import multiprocessing
+import os
+from functools import partial
+from collections import deque
+from dataclasses import dataclass, fields
 import simpy
-import random
+import numpy as np
 import pandas as pd
 
+import fast_simulation
+from fast_simulation import MACHINING, ASSEMBLY, QUALITY_CONTROL, PACKAGING
+
 # Ali Bahadir Sensoz
 # Sila Er
 # Project 2-ManufacturingSystem
@@ -9,30 +17,37 @@ import pandas as pd
 
 class Shift:
     def __init__(self, env, start_time, end_time):
+        fast_simulation.check_shift(start_time, end_time)
         self.env = env
         self.start_time = start_time
         self.end_time = end_time
         self.is_active = False
+        # Triggered each time the shift starts, then replaced for the next one
+        self.active_event = env.event()
         self.process = env.process(self.run())
 
     def run(self):
+        # Shift boundaries are computed in absolute time for each day
+        day = int(self.env.now // 24)
         while True:
-            now = self.env.now % 24
-            if now < self.start_time:
-                yield self.env.timeout(self.start_time - now)
-            elif now >= self.start_time and now < self.end_time:
+            next_start = day * 24 + self.start_time
+            next_end = day * 24 + self.end_time
+            if self.env.now < next_end:
+                if self.env.now < next_start:
+                    yield self.env.timeout(next_start - self.env.now)
                 self.is_active = True
-                yield self.env.timeout(self.end_time - now)
-                self.is_active = False
-                yield self.env.timeout(24 - (self.end_time - now))
-            else:
+                self.active_event.succeed()
+                self.active_event = self.env.event()
+                yield self.env.timeout(next_end - self.env.now)
                 self.is_active = False
-                yield self.env.timeout(24 - now + self.start_time)
+            day += 1
 
 class ManufacturingSystem:
-    def __init__(self, env, machine_count=2, shift_start=8, shift_end=20):
+    def __init__(self, env, machine_count=2, shift_start=8, shift_end=20, until=200, seed=None, n_product_lines=1,
+                 verbose=False):
         self.env = env
-        self.raw_materials = simpy.Store(env)
+        self.verbose = verbose
+        self.event_log = []
         self.machining = simpy.Resource(env, capacity=machine_count)
         self.assembly = simpy.Resource(env, capacity=2)
         self.quality_control = simpy.Resource(env, capacity=1)
@@ -42,119 +57,210 @@ class ManufacturingSystem:
         # Track machine setup for different products
         self.machine_setup = {i: None for i in range(machine_count)}
         self.setup_time = {i: 0 for i in range(machine_count)}
+        # Idle machines; a part takes one when its machining request is granted
+        self._free_machines = deque(range(machine_count))
+
+        # Random durations are drawn up front, one batch per stage, large enough
+        # for every part that can start a stage before `until`
+        max_parts = fast_simulation.batch_size(until, n_product_lines)
+        rng = np.random.default_rng(seed)
+        # Stored as lists so indexing returns plain floats
+        self._setup_t = rng.uniform(0.5, 1.5, max_parts).tolist()
+        self._mach_t = rng.uniform(4, 6, max_parts).tolist()
+        self._mach_fail = (rng.random(max_parts) < 0.1).tolist()  # 10% failure rate
+        self._repair_t = rng.uniform(1, 3, max_parts).tolist()
+        self._asm_t = rng.uniform(2, 4, max_parts).tolist()
+        self._qc_t = rng.uniform(1, 2, max_parts).tolist()
+        self._pkg_t = rng.uniform(0.5, 1.5, max_parts).tolist()
+        # Gap before a product line starts its next part, averaging 1 hour
+        self._interarrival = rng.exponential(1.0, max_parts).tolist()
+        self._setup_idx = 0
+        self._mach_idx = 0
+        self._asm_idx = 0
+        self._qc_idx = 0
+        self._pkg_idx = 0
+        self._ia_idx = 0
 
         # Metrics
         self.total_products_produced = 0
-        self.total_waiting_times = {
-            'machining': 0,
-            'assembly': 0,
-            'quality_control': 0,
-            'packaging': 0
-        }
-        self.processed_parts = {
-            'machining': 0,
-            'assembly': 0,
-            'quality_control': 0,
-            'packaging': 0
-        }
-
-    def load_raw_material(self, raw_material):
-        yield self.raw_materials.put(raw_material)
-        print(f'Loaded raw material at {self.env.now}')
+        self.total_waiting_times = [0.0] * 4
+        self.processed_parts = [0] * 4
+
+    def log(self, event, product_type=None):
+        # Events are only collected when verbose, and formatted once at the end of the run
+        if self.verbose:
+            self.event_log.append((event, product_type, self.env.now))
+
+    def print_event_log(self):
+        for event, product_type, now in self.event_log:
+            if product_type is None:
+                print(f'{event} at {now}')
+            else:
+                print(f'{event} for {product_type} at {now}')
 
     def machining_process(self, part, product_type):
         with self.machining.request() as request:
+            # Waiting time is the time spent queueing for the resource
+            start_time = self.env.now
             yield request
-            machine_id = self.get_available_machine()
+            wait_time = self.env.now - start_time
+            self.total_waiting_times[MACHINING] += wait_time
+            self.processed_parts[MACHINING] += 1
+
+            machine_id = self._free_machines.popleft()
             if self.machine_setup[machine_id] != product_type:
-                setup_time = random.uniform(0.5, 1.5)
+                setup_time = self._setup_t[self._setup_idx]
+                self._setup_idx += 1
                 yield self.env.timeout(setup_time)
                 self.machine_setup[machine_id] = product_type
                 self.setup_time[machine_id] += setup_time
 
-            start_time = self.env.now
-            machining_time = random.uniform(4, 6)
+            mach_idx = self._mach_idx
+            self._mach_idx += 1
+            machining_time = self._mach_t[mach_idx]
             yield self.env.timeout(machining_time)
-            wait_time = self.env.now - start_time
-            self.total_waiting_times['machining'] += wait_time
-            self.processed_parts['machining'] += 1
-            print(f'Machined part for {product_type} at {self.env.now}')
-            if random.random() < 0.1:  # 10% failure rate
-                repair_time = random.uniform(1, 3)
+            self.log('Machined part', product_type)
+            if self._mach_fail[mach_idx]:
+                repair_time = self._repair_t[mach_idx]
                 yield self.env.timeout(repair_time)
-                print(f'Machine repaired at {self.env.now}')
+                self.log('Machine repaired')
+            self._free_machines.append(machine_id)
 
     def assembly_process(self, part, product_type):
         with self.assembly.request() as request:
-            yield request
             start_time = self.env.now
-            assembly_time = random.uniform(2, 4)
-            yield self.env.timeout(assembly_time)
+            yield request
             wait_time = self.env.now - start_time
-            self.total_waiting_times['assembly'] += wait_time
-            self.processed_parts['assembly'] += 1
-            print(f'Assembled part for {product_type} at {self.env.now}')
+            self.total_waiting_times[ASSEMBLY] += wait_time
+            self.processed_parts[ASSEMBLY] += 1
+
+            assembly_time = self._asm_t[self._asm_idx]
+            self._asm_idx += 1
+            yield self.env.timeout(assembly_time)
+            self.log('Assembled part', product_type)
 
     def quality_control_process(self, product, product_type):
         with self.quality_control.request() as request:
-            yield request
             start_time = self.env.now
-            qc_time = random.uniform(1, 2)
-            yield self.env.timeout(qc_time)
+            yield request
             wait_time = self.env.now - start_time
-            self.total_waiting_times['quality_control'] += wait_time
-            self.processed_parts['quality_control'] += 1
-            print(f'Quality checked product for {product_type} at {self.env.now}')
+            self.total_waiting_times[QUALITY_CONTROL] += wait_time
+            self.processed_parts[QUALITY_CONTROL] += 1
+
+            qc_time = self._qc_t[self._qc_idx]
+            self._qc_idx += 1
+            yield self.env.timeout(qc_time)
+            self.log('Quality checked product', product_type)
 
     def packaging_process(self, product, product_type):
         with self.packaging.request() as request:
-            yield request
             start_time = self.env.now
-            packaging_time = random.uniform(0.5, 1.5)
-            yield self.env.timeout(packaging_time)
+            yield request
             wait_time = self.env.now - start_time
-            self.total_waiting_times['packaging'] += wait_time
-            self.processed_parts['packaging'] += 1
-            print(f'Packaged product for {product_type} at {self.env.now}')
+            self.total_waiting_times[PACKAGING] += wait_time
+            self.processed_parts[PACKAGING] += 1
+
+            packaging_time = self._pkg_t[self._pkg_idx]
+            self._pkg_idx += 1
+            yield self.env.timeout(packaging_time)
+            self.log('Packaged product', product_type)
             self.total_products_produced += 1
 
+    def _full_pipeline(self, part, product_type):
+        # Stages run one after another in the producer's own process
+        yield from self.machining_process(part, product_type)
+        yield from self.assembly_process(part, product_type)
+        yield from self.quality_control_process(part, product_type)
+        yield from self.packaging_process(part, product_type)
+
     def run_production(self, product_type):
         while True:
             if self.shift.is_active:
                 raw_material = f'raw_material_{product_type}'
-                yield self.env.process(self.load_raw_material(raw_material))
-                yield self.env.process(self.machining_process(raw_material, product_type))
-                yield self.env.process(self.assembly_process(raw_material, product_type))
-                yield self.env.process(self.quality_control_process(raw_material, product_type))
-                yield self.env.process(self.packaging_process(raw_material, product_type))
-                yield self.env.timeout(1)
+                yield from self._full_pipeline(raw_material, product_type)
+                interarrival_time = self._interarrival[self._ia_idx]
+                self._ia_idx += 1
+                yield self.env.timeout(interarrival_time)
             else:
-                yield self.env.timeout(1)
-
-    def get_available_machine(self):
-        for i in range(len(self.machine_setup)):
-            if self.machining.count < self.machining.capacity:
-                return i
-        return 0
+                yield self.shift.active_event
 
 def run_simulation(env, system, product_types):
     for product_type in product_types:
         env.process(system.run_production(product_type))
 
-def run_scenario(machine_count, shift_start, shift_end, product_types):
-    env = simpy.Environment()
-    system = ManufacturingSystem(env, machine_count, shift_start, shift_end)
+@dataclass(slots=True)
+class ScenarioResult:
+    machine_count: int
+    shift_start: int
+    shift_end: int
+    product_types: str
+    total_produced: int
+    avg_wait_machining: float
+    avg_wait_assembly: float
+    avg_wait_qc: float
+    avg_wait_packaging: float
+
+# CSV header for ScenarioResult fields; a field without one keeps its own name
+RESULT_HEADERS = {
+    'machine_count': 'Machine Count',
+    'shift_start': 'Shift Start',
+    'shift_end': 'Shift End',
+    'product_types': 'Product Types',
+    'total_produced': 'Total Products Produced',
+    'avg_wait_machining': 'Average Waiting Time (Machining)',
+    'avg_wait_assembly': 'Average Waiting Time (Assembly)',
+    'avg_wait_qc': 'Average Waiting Time (Quality Control)',
+    'avg_wait_packaging': 'Average Waiting Time (Packaging)'
+}
+
+def average_waiting_time(system, stage):
+    # Running total and count are kept per stage, so no per-part samples are stored
+    count = system.processed_parts[stage]
+    return system.total_waiting_times[stage] / count if count else 0.0
+
+def run_scenario(machine_count, shift_start, shift_end, product_types, engine='simpy', verbose=False, until=200):
+    # Only the SimPy model collects an event log
+    if verbose and engine in ('numba', 'fast'):
+        raise ValueError(f"verbose is only supported by the 'simpy' engine, not {engine!r}")
     print(f'Started scenario with {machine_count} machines, shift {shift_start}-{shift_end}, products: {product_types}')
-    run_simulation(env, system, product_types)
-    env.run(until=200)
+    if engine == 'numba':
+        # Imported here so the SimPy model still runs without numba installed
+        import numba_simulation
+        system = numba_simulation.run_scenario(machine_count, shift_start, shift_end, product_types, until=until)
+    elif engine == 'fast':
+        system = fast_simulation.run_scenario(machine_count, shift_start, shift_end, product_types, until=until)
+    else:
+        env = simpy.Environment()
+        system = ManufacturingSystem(env, machine_count, shift_start, shift_end, until=until,
+                                     n_product_lines=len(product_types), verbose=verbose)
+        run_simulation(env, system, product_types)
+        env.run(until=until)
+        if verbose:
+            system.print_event_log()
     print(f'Completed scenario with {machine_count} machines, shift {shift_start}-{shift_end}, products: {product_types}')
 
-    return system
+    # Plain values only, so the result can be sent back from a worker process
+    return ScenarioResult(
+        machine_count=machine_count,
+        shift_start=shift_start,
+        shift_end=shift_end,
+        product_types=', '.join(product_types),
+        total_produced=system.total_products_produced,
+        avg_wait_machining=average_waiting_time(system, MACHINING),
+        avg_wait_assembly=average_waiting_time(system, ASSEMBLY),
+        avg_wait_qc=average_waiting_time(system, QUALITY_CONTROL),
+        avg_wait_packaging=average_waiting_time(system, PACKAGING)
+    )
 
-# Running different scenarios and collecting results
-results = []
+# 'simpy' runs the ManufacturingSystem model, 'numba' the compiled event loop in numba_simulation.py,
+# 'fast' the heap-based scheduler in fast_simulation.py
+ENGINE = 'simpy'
 
-scenarios = [
+def run_scenario_tuple(scenario, engine=ENGINE, verbose=False):
+    machine_count, shift_start, shift_end, product_types = scenario
+    return run_scenario(machine_count, shift_start, shift_end, product_types, engine=engine, verbose=verbose)
+
+SCENARIOS = [
     (2, 8, 20, ['A', 'B']),
     (3, 6, 18, ['A', 'B']),
     (1, 7, 19, ['A', 'B', 'C']),
@@ -167,36 +273,32 @@ scenarios = [
     (4, 8, 20, ['A', 'B', 'C'])
 ]
 
-for scenario in scenarios:
-    machine_count, shift_start, shift_end, product_types = scenario
-    system = run_scenario(machine_count, shift_start, shift_end, product_types)
-
-    avg_waiting_time_machining = system.total_waiting_times['machining'] / system.processed_parts['machining'] if system.processed_parts['machining'] > 0 else 0
-    avg_waiting_time_assembly = system.total_waiting_times['assembly'] / system.processed_parts['assembly'] if system.processed_parts['assembly'] > 0 else 0
-    avg_waiting_time_quality_control = system.total_waiting_times['quality_control'] / system.processed_parts['quality_control'] if system.processed_parts['quality_control'] > 0 else 0
-    avg_waiting_time_packaging = system.total_waiting_times['packaging'] / system.processed_parts['packaging'] if system.processed_parts['packaging'] > 0 else 0
-
-    # Print average waiting times for debugging
-    print(f'Average Waiting Time (Machining): {avg_waiting_time_machining}')
-    print(f'Average Waiting Time (Assembly): {avg_waiting_time_assembly}')
-    print(f'Average Waiting Time (Quality Control): {avg_waiting_time_quality_control}')
-    print(f'Average Waiting Time (Packaging): {avg_waiting_time_packaging}')
-
-    results.append({
-        'Machine Count': machine_count,
-        'Shift Start': shift_start,
-        'Shift End': shift_end,
-        'Product Types': ', '.join(product_types),
-        'Total Products Produced': system.total_products_produced,
-        'Average Waiting Time (Machining)': f'{avg_waiting_time_machining:.2f}'.replace('.', ','),
-        'Average Waiting Time (Assembly)': f'{avg_waiting_time_assembly:.2f}'.replace('.', ','),
-        'Average Waiting Time (Quality Control)': f'{avg_waiting_time_quality_control:.2f}'.replace('.', ','),
-        'Average Waiting Time (Packaging)': f'{avg_waiting_time_packaging:.2f}'.replace('.', ',')
-    })
-
-# Displaying the results
-df = pd.DataFrame(results)
-print(df)
-
-# Save the results to a CSV file using semicolon as delimiter
-df.to_csv('simulation_results.csv', index=False, sep=';')
+def main(engine=ENGINE, verbose=False):
+    if engine == 'numba':
+        # Compile once here (a no-op with the AOT build) rather than in every worker
+        import numba_simulation
+        numba_simulation.warmup()
+
+    # Scenarios are independent, so they run in parallel worker processes
+    with multiprocessing.Pool(min(len(SCENARIOS), os.cpu_count() or 1)) as pool:
+        results = pool.map(partial(run_scenario_tuple, engine=engine, verbose=verbose), SCENARIOS)
+
+    for result in results:
+        # Print average waiting times for debugging, labelled since results arrive after all scenarios finish
+        print(f'Scenario with {result.machine_count} machines, shift {result.shift_start}-{result.shift_end}, '
+              f'products: {result.product_types}')
+        print(f'Average Waiting Time (Machining): {result.avg_wait_machining}')
+        print(f'Average Waiting Time (Assembly): {result.avg_wait_assembly}')
+        print(f'Average Waiting Time (Quality Control): {result.avg_wait_qc}')
+        print(f'Average Waiting Time (Packaging): {result.avg_wait_packaging}')
+
+    # Displaying the results, built column by column
+    df = pd.DataFrame({RESULT_HEADERS.get(field.name, field.name): [getattr(result, field.name) for result in results]
+                       for field in fields(ScenarioResult)})
+    print(df.to_string(float_format='{:.2f}'.format))
+
+    # Save the results to a CSV file using semicolon as delimiter and decimal comma
+    df.to_csv('simulation_results.csv', index=False, sep=';', float_format='%.2f', decimal=',')
+
+if __name__ == '__main__':
+    main()
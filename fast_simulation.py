@@ -0,0 +1,164 @@
+import heapq
+import itertools
+from collections import deque
+
+import numpy as np
+
+# Pure Python version of the ManufacturingSystem model on a small heap-based
+# scheduler. Same stages, capacities and time distributions as the SimPy model,
+# but stages are plain callbacks instead of generators.
+
+# Stage indices into the metric lists, shared by all engines
+MACHINING, ASSEMBLY, QUALITY_CONTROL, PACKAGING = 0, 1, 2, 3
+
+
+def check_shift(shift_start, shift_end):
+    # Shifts run within a single day; overnight shifts are not modelled. This
+    # also keeps the sleep until the next shift start positive.
+    if not 0 <= shift_start < shift_end <= 24:
+        raise ValueError(f'Shift must satisfy 0 <= start < end <= 24, got {shift_start}-{shift_end}')
+
+
+def batch_size(until, n_product_lines):
+    # Number of random durations to draw up front per stage. Every part goes
+    # through quality control (capacity 1, at least 1 hour), so at most
+    # until / 1 + 1 parts start it; each product line holds at most one more
+    # part in the stages before it.
+    min_cycle_time = 1
+    return int(until / min_cycle_time) + 1 + n_product_lines
+
+
+class FastScheduler:
+    def __init__(self):
+        self._heap = []
+        self._now = 0.0
+        self._counter = itertools.count()
+
+    @property
+    def now(self):
+        return self._now
+
+    def schedule(self, delay, callback):
+        # The counter keeps callbacks due at the same time in scheduling order
+        heapq.heappush(self._heap, (self._now + delay, next(self._counter), callback))
+
+    def run(self, until):
+        heap = self._heap
+        while heap and heap[0][0] < until:
+            self._now, _, callback = heapq.heappop(heap)
+            callback()
+        self._now = until
+
+
+class FastResource:
+    def __init__(self, capacity):
+        self.free = capacity
+        self.waiting = deque()
+
+    def request(self, callback):
+        # callback runs as soon as a unit of the resource is granted
+        if self.free:
+            self.free -= 1
+            callback()
+        else:
+            self.waiting.append(callback)
+
+    def release(self):
+        if self.waiting:
+            self.waiting.popleft()()
+        else:
+            self.free += 1
+
+
+class FastManufacturingSystem:
+    def __init__(self, scheduler, machine_count=2, shift_start=8, shift_end=20, until=200, seed=None,
+                 n_product_lines=1):
+        check_shift(shift_start, shift_end)
+        self.scheduler = scheduler
+        self.shift_start = shift_start
+        self.shift_end = shift_end
+        self.resources = [FastResource(machine_count), FastResource(2), FastResource(1), FastResource(1)]
+
+        # Track machine setup for different products
+        self.machine_setup = {i: None for i in range(machine_count)}
+        self.setup_time = {i: 0 for i in range(machine_count)}
+        self._free_machines = deque(range(machine_count))
+
+        # Random durations drawn up front, sized as in ManufacturingSystem
+        max_parts = batch_size(until, n_product_lines)
+        rng = np.random.default_rng(seed)
+        self._setup_t = rng.uniform(0.5, 1.5, max_parts).tolist()
+        self._mach_fail = (rng.random(max_parts) < 0.1).tolist()  # 10% failure rate
+        self._repair_t = rng.uniform(1, 3, max_parts).tolist()
+        self._interarrival = rng.exponential(1.0, max_parts).tolist()
+        self._durations = [
+            rng.uniform(4, 6, max_parts).tolist(),
+            rng.uniform(2, 4, max_parts).tolist(),
+            rng.uniform(1, 2, max_parts).tolist(),
+            rng.uniform(0.5, 1.5, max_parts).tolist()
+        ]
+        self._duration_idx = [0] * 4
+        self._setup_idx = 0
+        self._ia_idx = 0
+
+        # Metrics
+        self.total_products_produced = 0
+        self.total_waiting_times = [0.0] * 4
+        self.processed_parts = [0] * 4
+
+    def start_part(self, product_type):
+        now = self.scheduler.now
+        hour = now % 24
+        if hour < self.shift_start or hour >= self.shift_end:
+            # Sleep until the next shift starts
+            delay = (self.shift_start - hour) % 24
+            self.scheduler.schedule(delay, lambda: self.start_part(product_type))
+            return
+        self._request(MACHINING, product_type)
+
+    def _request(self, stage, product_type):
+        requested_at = self.scheduler.now
+        self.resources[stage].request(lambda: self._start(stage, product_type, requested_at))
+
+    def _start(self, stage, product_type, requested_at):
+        # Waiting time is the time spent queueing for the resource
+        self.total_waiting_times[stage] += self.scheduler.now - requested_at
+        self.processed_parts[stage] += 1
+
+        idx = self._duration_idx[stage]
+        self._duration_idx[stage] = idx + 1
+        duration = self._durations[stage][idx]
+        machine_id = None
+        if stage == MACHINING:
+            machine_id = self._free_machines.popleft()
+            if self.machine_setup[machine_id] != product_type:
+                setup_time = self._setup_t[self._setup_idx]
+                self._setup_idx += 1
+                duration += setup_time
+                self.machine_setup[machine_id] = product_type
+                self.setup_time[machine_id] += setup_time
+            if self._mach_fail[idx]:
+                duration += self._repair_t[idx]
+        self.scheduler.schedule(duration, lambda: self._finish(stage, product_type, machine_id))
+
+    def _finish(self, stage, product_type, machine_id):
+        if stage == MACHINING:
+            self._free_machines.append(machine_id)
+        self.resources[stage].release()
+        if stage == PACKAGING:
+            self.total_products_produced += 1
+            delay = self._interarrival[self._ia_idx]
+            self._ia_idx += 1
+            self.scheduler.schedule(delay, lambda: self.start_part(product_type))
+        else:
+            self._request(stage + 1, product_type)
+
+
+def run_scenario(machine_count, shift_start, shift_end, product_types, until=200, seed=None):
+    scheduler = FastScheduler()
+    system = FastManufacturingSystem(scheduler, machine_count, shift_start, shift_end, until=until, seed=seed,
+                                     n_product_lines=len(product_types))
+    for product_type in product_types:
+        scheduler.schedule(0, lambda product_type=product_type: system.start_part(product_type))
+    scheduler.run(until)
+    return system
@@ -0,0 +1,134 @@
+import numpy as np
+from numba import njit
+
+# Module globals, so numba compiles them in as constants
+from fast_simulation import MACHINING, ASSEMBLY, QUALITY_CONTROL, PACKAGING
+
+# Compiled event loop behind numba_simulation.run_scenario(). Importing this
+# module compiles simulate() from its signature (or loads it from the on-disk
+# cache), so it is only imported when the AOT build is not available.
+
+IDLE = -1
+
+
+@njit(cache=True)
+def _start_service(p, s, clock, next_time, stage, request_time, machine_of, free_machines, free_ends, machine_setup,
+                   product_ids, total_waiting_times, processed_parts):
+    # Waiting time is the time spent queueing for the stage
+    total_waiting_times[s] += clock - request_time[p]
+    processed_parts[s] += 1
+    stage[p] = s
+    if s == MACHINING:
+        # Take the machine that has been idle longest, from the front of the ring
+        machine_id = free_machines[free_ends[0]]
+        free_ends[0] = (free_ends[0] + 1) % free_machines.size
+        free_ends[1] -= 1
+        machine_of[p] = machine_id
+        duration = 0.0
+        if machine_setup[machine_id] != product_ids[p]:
+            duration += np.random.uniform(0.5, 1.5)
+            machine_setup[machine_id] = product_ids[p]
+        duration += np.random.uniform(4, 6)
+        if np.random.random() < 0.1:  # 10% failure rate
+            duration += np.random.uniform(1, 3)
+    elif s == ASSEMBLY:
+        duration = np.random.uniform(2, 4)
+    elif s == QUALITY_CONTROL:
+        duration = np.random.uniform(1, 2)
+    else:
+        duration = np.random.uniform(0.5, 1.5)
+    next_time[p] = clock + duration
+
+
+# Explicit signature: compiled once, eagerly, and never re-specialised per call
+@njit('Tuple((f8[:], i8[:], i8))(i8, f8, f8, i8[:], f8, i8)', cache=True)
+def simulate(machine_count, shift_start, shift_end, product_ids, until, seed):
+    # product_ids holds one integer product type per line; lines of the same
+    # type share machine setups
+    np.random.seed(seed)
+    n_products = product_ids.size
+
+    capacity = np.array([machine_count, 2, 1, 1], dtype=np.int64)
+    busy = np.zeros(4, dtype=np.int64)
+
+    # FIFO queue per stage, stored as a ring buffer of product line ids
+    queue = np.empty((4, n_products), dtype=np.int32)
+    queue_head = np.zeros(4, dtype=np.int64)
+    queue_len = np.zeros(4, dtype=np.int64)
+
+    # Idle machine ids as a FIFO ring buffer, with its head and length in free_ends
+    free_machines = np.arange(machine_count)
+    free_ends = np.array([0, machine_count])
+    machine_setup = np.full(machine_count, -1, dtype=np.int64)
+
+    # Each product line is one entity walking through the stages
+    next_time = np.zeros(n_products)
+    stage = np.full(n_products, IDLE, dtype=np.int64)
+    request_time = np.zeros(n_products)
+    machine_of = np.zeros(n_products, dtype=np.int64)
+    # Lines woken at the same shift start resume in the order they went idle,
+    # as they do on SimPy's active_event
+    idle_order = np.arange(n_products)
+    n_idle = n_products
+
+    total_waiting_times = np.zeros(4)
+    processed_parts = np.zeros(4, dtype=np.int64)
+    total_products_produced = 0
+    if n_products == 0:
+        # No product lines, so nothing is ever scheduled
+        return total_waiting_times, processed_parts, total_products_produced
+
+    while True:
+        p = 0
+        for i in range(1, n_products):
+            if next_time[i] < next_time[p] or (next_time[i] == next_time[p] and idle_order[i] < idle_order[p]):
+                p = i
+        clock = next_time[p]
+        if clock >= until:
+            break
+
+        s = stage[p]
+        if s == IDLE:
+            hour = clock % 24
+            if hour < shift_start or hour >= shift_end:
+                # Sleep until the next shift starts
+                next_time[p] = clock + (shift_start - hour) % 24
+                idle_order[p] = n_idle
+                n_idle += 1
+                continue
+            s = MACHINING
+        else:
+            # Service finished: hand the resource on to the next in the queue
+            if s == MACHINING:
+                free_machines[(free_ends[0] + free_ends[1]) % machine_count] = machine_of[p]
+                free_ends[1] += 1
+            busy[s] -= 1
+            if queue_len[s] > 0:
+                q = queue[s, queue_head[s]]
+                queue_head[s] = (queue_head[s] + 1) % n_products
+                queue_len[s] -= 1
+                busy[s] += 1
+                _start_service(q, s, clock, next_time, stage, request_time, machine_of, free_machines, free_ends, machine_setup,
+                               product_ids, total_waiting_times, processed_parts)
+
+            if s == PACKAGING:
+                total_products_produced += 1
+                stage[p] = IDLE
+                # Gap before the line starts its next part, averaging 1 hour
+                next_time[p] = clock + np.random.exponential(1.0)
+                continue
+            s += 1
+
+        # Request the next stage
+        request_time[p] = clock
+        if busy[s] < capacity[s]:
+            busy[s] += 1
+            _start_service(p, s, clock, next_time, stage, request_time, machine_of, free_machines, free_ends, machine_setup,
+                           product_ids, total_waiting_times, processed_parts)
+        else:
+            queue[s, (queue_head[s] + queue_len[s]) % n_products] = p
+            queue_len[s] += 1
+            stage[p] = s
+            next_time[p] = np.inf
+
+    return total_waiting_times, processed_parts, total_products_produced
@@ -0,0 +1,75 @@
+import os
+import random
+from types import SimpleNamespace
+
+import numpy as np
+
+from fast_simulation import check_shift
+
+try:
+    # Ahead-of-time build of simulate(), see build_aot(); runs without numba
+    import manufacturing_sim
+except ImportError:
+    manufacturing_sim = None
+
+# Numba version of the ManufacturingSystem model. Same stages, capacities and
+# time distributions as the SimPy model, but driven by a plain event loop over
+# one "next event time" per product line instead of SimPy generators. The loop
+# itself lives in numba_kernel.py.
+
+
+def warmup():
+    # Compile (or load from the on-disk cache) once in the parent process, so
+    # pool workers only ever load the cache instead of compiling side by side
+    if manufacturing_sim is None:
+        import numba_kernel
+
+
+def run_scenario(machine_count, shift_start, shift_end, product_types, until=200, seed=None):
+    check_shift(shift_start, shift_end)
+    if seed is None:
+        seed = random.randrange(2 ** 31)
+    # Integer id per product type, so lines of the same type share machine setups
+    type_ids = {}
+    product_ids = np.array([type_ids.setdefault(t, len(type_ids)) for t in product_types], dtype=np.int64)
+    # Always the same argument types, so the cached compilation is reused
+    args = (int(machine_count), float(shift_start), float(shift_end), product_ids, float(until), int(seed))
+    if manufacturing_sim is not None:
+        packed = manufacturing_sim.simulate(*args)
+        total_waiting_times, processed_parts = packed[:4], packed[4:8].astype(np.int64)
+        total_products_produced = packed[8]
+    else:
+        from numba_kernel import simulate
+        total_waiting_times, processed_parts, total_products_produced = simulate(*args)
+
+    # Same attributes the driver reads from a SimPy ManufacturingSystem
+    return SimpleNamespace(
+        total_products_produced=int(total_products_produced),
+        total_waiting_times=total_waiting_times.tolist(),
+        processed_parts=processed_parts.tolist(),
+    )
+
+
+def build_aot():
+    # Writes manufacturing_sim*.so next to this file; run_scenario() uses it when present
+    from numba.pycc import CC
+    from numba_kernel import simulate
+
+    cc = CC('manufacturing_sim')
+    cc.output_dir = os.path.dirname(os.path.abspath(__file__))
+
+    @cc.export('simulate', 'f8[:](i8,f8,f8,i8[:],f8,i8)')
+    def simulate_packed(machine_count, shift_start, shift_end, product_ids, until, seed):
+        total_waiting_times, processed_parts, total_products_produced = simulate(
+            machine_count, shift_start, shift_end, product_ids, until, seed)
+        packed = np.empty(9)
+        packed[:4] = total_waiting_times
+        packed[4:8] = processed_parts
+        packed[8] = total_products_produced
+        return packed
+
+    cc.compile()
+
+
+if __name__ == '__main__':
+    build_aot()